@@ -0,0 +1,100 @@
+# app/gen_cache.py
+"""
+Generative Cache Module
+Caches generated files keyed by the *structure* of the brief/checks,
+so structurally similar briefs reuse prior output instead of a new
+Gemini round-trip. Variable parts (the brief text itself) are swapped
+in via a small templating pass on hit.
+"""
+
+import hashlib
+import json
+import os
+import re
+
+GEN_CACHE_PATH = "/tmp/gen_cache.json"
+
+# Strip numerals and capitalized (proper-noun-like) words so that briefs
+# differing only in names/numbers map to the same template key.
+# Sentence-initial capitalized words ("Create", "Build", ...) are kept —
+# they carry the verb of the brief, not a variable name.
+_NUMERAL_RE = re.compile(r"\b\d+\b")
+_PROPER_NOUN_RE = re.compile(r"\b[A-Z][a-zA-Z0-9]*\b")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _strip_variables(brief):
+    text = _NUMERAL_RE.sub("", brief)
+
+    def _drop(m):
+        prev = text[:m.start()].rstrip()
+        if not prev or prev[-1] in ".!?":
+            return m.group(0)
+        return ""
+
+    return _PROPER_NOUN_RE.sub(_drop, text)
+
+
+def template_key(brief, checks=None, round_num=1):
+    """
+    Build a structural key for a brief: tokenize, drop numerals and
+    non-sentence-initial proper nouns, sort the checks, then SHA-256
+    the result.
+    """
+    normalized = _strip_variables(brief or "")
+    normalized = _WHITESPACE_RE.sub(" ", normalized).strip().lower()
+    payload = json.dumps({
+        "brief": normalized,
+        "checks": sorted(checks or []),
+        "round": round_num
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _load_cache():
+    if os.path.exists(GEN_CACHE_PATH):
+        try:
+            return json.load(open(GEN_CACHE_PATH))
+        except (json.JSONDecodeError, OSError):
+            return {}
+    return {}
+
+
+def _save_cache(cache):
+    try:
+        json.dump(cache, open(GEN_CACHE_PATH, "w"))
+    except OSError as e:
+        print(f"⚠️ Could not persist gen cache: {e}")
+
+
+def lookup(key, brief):
+    """
+    Look up a structural key. On hit, re-fill the variable slots
+    (the original brief text) with the new brief and return the files.
+    Returns None on miss, or when the briefs differ and the old brief
+    isn't present verbatim in every cached file — substituting would
+    silently return another brief's output unchanged.
+    """
+    cache = _load_cache()
+    entry = cache.get(key)
+    if not entry:
+        return None
+    old_brief = entry.get("slots", {}).get("brief", "")
+    cached_files = entry.get("files", {})
+    if old_brief != brief:
+        if not old_brief or not all(old_brief in c for c in cached_files.values()):
+            return None
+    files = {}
+    for name, content in cached_files.items():
+        if old_brief != brief:
+            content = content.replace(old_brief, brief)
+        files[name] = content
+    print(f"✅ Gen cache hit for key {key[:12]}…")
+    return files
+
+
+def store(key, brief, files):
+    """Store generated files plus the brief used, for later slot-filling."""
+    cache = _load_cache()
+    cache[key] = {"files": files, "slots": {"brief": brief}}
+    _save_cache(cache)
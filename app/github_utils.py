@@ -1,4 +1,6 @@
 # app/github_utils.py
+import asyncio
+import base64
 import os
 from github import Github
 from github import GithubException
@@ -34,6 +36,13 @@ def create_repo(repo_name: str, description: str = ""):
     print("Created repo:", repo.full_name)
     return repo
 
+def get_repo(repo_name: str):
+    """
+    Fetch an existing repository of the authenticated user.
+    """
+    return g.get_user().get_repo(repo_name)
+
+
 def create_or_update_file(repo, path: str, content: str, message: str):
     """
     Create a file or update if it already exists.
@@ -88,6 +97,73 @@ def create_or_update_binary_file(repo, path: str, binary_content, commit_message
         print(f"Error creating/updating binary file {path}: {e}")
         return False
 
+async def put_file_async(client, repo_full_name: str, path: str, content: str, message: str):
+    """
+    Create or update one file via the Contents API (async).
+    Fetches the current sha first (required for updates) and retries on
+    409, which GitHub returns when the branch advanced under a
+    concurrent commit.
+    """
+    url = f"https://api.github.com/repos/{repo_full_name}/contents/{path}"
+    headers = {"Authorization": f"token {GITHUB_TOKEN}", "Accept": "application/vnd.github.v3+json"}
+    body = {
+        "message": message,
+        "content": base64.b64encode(content.encode("utf-8")).decode("ascii")
+    }
+    for attempt in range(3):
+        r = await client.get(url, headers=headers)
+        if r.status_code == 200:
+            body["sha"] = r.json().get("sha")
+        r = await client.put(url, headers=headers, json=body)
+        if r.status_code in (200, 201):
+            print(f"Committed {path} in {repo_full_name}")
+            return {"sha": (r.json().get("content") or {}).get("sha")}
+        if r.status_code == 409 and attempt < 2:
+            await asyncio.sleep(1)
+            continue
+        print(f"Contents API returned {r.status_code} for {path}: {r.text}")
+        return False
+    return False
+
+
+async def commit_files_async(repo_full_name: str, files: dict, message_prefix: str = ""):
+    """
+    Commit several files concurrently via the Contents API.
+    files: {path: content}. Independent writes go out in parallel with
+    asyncio.gather instead of one blocking round-trip each.
+    Returns {path: {"sha"} on success, False on failure}.
+    """
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        tasks = [
+            put_file_async(client, repo_full_name, path, content, f"{message_prefix}Add/Update {path}")
+            for path, content in files.items()
+        ]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+    out = {}
+    for path, result in zip(files, results):
+        if isinstance(result, Exception):
+            print(f"Failed to commit {path}: {result}")
+            out[path] = False
+        else:
+            out[path] = result
+    return out
+
+
+async def get_file_async(repo_full_name: str, path: str):
+    """
+    GET one file's text via the Contents API.
+    Returns the decoded content, or None when unavailable.
+    """
+    url = f"https://api.github.com/repos/{repo_full_name}/contents/{path}"
+    headers = {"Authorization": f"token {GITHUB_TOKEN}", "Accept": "application/vnd.github.v3+json"}
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        r = await client.get(url, headers=headers)
+    if r.status_code == 200:
+        return base64.b64decode(r.json().get("content", "")).decode("utf-8")
+    print(f"Contents API returned {r.status_code} for {path}")
+    return None
+
+
 def enable_pages(repo_name: str, branch: str = "main"):
     """
     Enable GitHub Pages via REST API; expects GITHUB_USERNAME in env.
@@ -0,0 +1,65 @@
+# app/llm_cache.py
+"""
+LLM Response Cache Module
+Exact-match, content-addressed cache for Gemini responses. Identical
+(brief, checks, round, prev_readme, attachments) tuples return the
+stored files without a network round-trip. Entries live as one JSON
+file per key under /tmp/llm_cache with a TTL.
+"""
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+CACHE_DIR = Path("/tmp/llm_cache")
+DEFAULT_TTL = 86400  # 1 day
+
+
+class LLMCache:
+    """File-backed exact-match cache with TTL and hit/miss counters."""
+
+    def __init__(self, cache_dir=CACHE_DIR, ttl=DEFAULT_TTL):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(brief, checks=None, round_num=1, prev_readme=None, attachment_names=None):
+        """SHA-256 of the canonical JSON of all inputs that affect the output."""
+        payload = json.dumps({
+            "brief": brief,
+            "checks": sorted(checks or []),
+            "round": round_num,
+            "prev_readme": prev_readme,
+            "attachments": sorted(attachment_names or [])
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Return the cached value, or None on miss/expiry."""
+        path = self.cache_dir / f"{key}.json"
+        try:
+            entry = json.load(open(path))
+            if time.time() > entry["expires_at"]:
+                os.remove(path)
+                self.misses += 1
+                return None
+            self.hits += 1
+            print(f"✅ LLM cache hit ({self.hits} hits / {self.misses} misses)")
+            return entry["value"]
+        except (OSError, json.JSONDecodeError, KeyError):
+            self.misses += 1
+            return None
+
+    def set(self, key, value, ttl=None):
+        """Store a value under the key; ttl overrides the default if given."""
+        path = self.cache_dir / f"{key}.json"
+        entry = {"expires_at": time.time() + (ttl if ttl is not None else self.ttl), "value": value}
+        try:
+            json.dump(entry, open(path, "w"))
+        except OSError as e:
+            print(f"⚠️ Could not write LLM cache entry: {e}")
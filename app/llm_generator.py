@@ -3,43 +3,136 @@ LLM Generator Module
 Uses Google Gemini API to generate web application code
 """
 
+import hashlib
+import html
 import os
+import re
+import threading
+import time
 from google import genai
 from pathlib import Path
 
+from app import gen_cache
+from app.llm_cache import LLMCache
+
+_llm_cache = LLMCache()
+
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
+# One client for the process: keeps the underlying HTTP session (and
+# its pooled TLS connections) alive across requests instead of paying
+# a fresh handshake per Gemini call
+_CLIENT = genai.Client(api_key=GEMINI_API_KEY) if GEMINI_API_KEY else None
+
+# Batch Mode halves per-token cost but can take much longer to return,
+# so it is opt-in for deployments without a tight SLA.
+GEMINI_BATCH_MODE = os.getenv("GEMINI_BATCH_MODE", "").lower() in ("1", "true", "yes")
+GEMINI_BATCH_POLL_SECONDS = int(os.getenv("GEMINI_BATCH_POLL_SECONDS", "10"))
+GEMINI_BATCH_MAX_WAIT_SECONDS = int(os.getenv("GEMINI_BATCH_MAX_WAIT_SECONDS", "600"))
+
 TMP_DIR = Path("/tmp/llm_attachments")
 TMP_DIR.mkdir(parents=True, exist_ok=True)
 
+# Static prompt text comes first so Gemini's implicit prefix cache can
+# reuse it across calls; only the variable block at the end changes.
+STATIC_SYSTEM_PREFIX = """You are a professional web developer assistant.
+
+Generate complete, production-ready code.
+
+Requirements:
+- Create a single, self-contained HTML file with embedded CSS and JavaScript
+- Modern, professional design with clean UI/UX
+- Fully responsive (mobile-first approach)
+- Use semantic HTML5 elements
+- Professional color scheme and typography
+- Include all necessary styling inline in <style> tags
+- Include all JavaScript inline in <script> tags
+- No external dependencies (no CDN links)
+
+IMPORTANT OUTPUT FORMAT:
+1. First, output the complete HTML code
+2. Then add a separator line: ---README.md---
+3. Then output a detailed README.md with:
+   - Project description
+   - Features
+   - How to use
+   - Technologies used
+
+Start HTML directly with <!DOCTYPE html>."""
+
+
+# Chunk length for streaming base64 decode; multiple of 4 so every
+# slice is independently decodable.
+_B64_CHUNK = 262144
+
+# data:[<mime>][;param=value...][;base64], — header only, so the base64
+# body is never materialized as its own string (for a 10 MB attachment
+# the body slice alone would cost ~13 MB of intermediate memory). Per
+# RFC 2397 the mediatype may be empty (data:;base64,...) and may carry
+# parameters (data:text/plain;charset=utf-8;base64,...).
+_DATA_URL_RE = re.compile(r"^data:([^;,]*)(?:;[^,]*)?,")
+
+# (name, size, sha256 of the base64 body) -> saved path; Round 2
+# usually re-sends Round 1's attachments unchanged, so matching blobs
+# skip the decode+write entirely
+_seen_attachments = {}
+
 
 def decode_attachments(attachments):
     """
     Decode and save base64 attachments
     attachments: list of {name, url: data:<mime>;base64,<b64>}
     Saves files into /tmp/llm_attachments/<name>
+    Decodes in 256 KB chunks straight to disk, so memory use stays
+    bounded regardless of attachment size.
     Returns list of dicts: {"name": name, "path": "/tmp/..", "mime": mime, "size": n}
     """
-    import base64
-    
+    import binascii
+
     saved = []
     for att in attachments or []:
         name = att.get("name") or "attachment"
         url = att.get("url", "")
-        if not url.startswith("data:"):
+        m = _DATA_URL_RE.match(url)
+        if not m:
             continue
         try:
-            header, b64data = url.split(",", 1)
-            mime = header.split(";")[0].replace("data:", "")
-            data = base64.b64decode(b64data)
+            mime = m.group(1)
+            body_start = m.end()
             path = TMP_DIR / name
-            with open(path, "wb") as f:
-                f.write(data)
+
+            # Expected decoded size from the base64 length and padding
+            expected_size = (len(url) - body_start) * 3 // 4
+            expected_size -= len(url) - len(url.rstrip("="))
+
+            # Hash the encoded body (chunked, no decode) and skip the
+            # write when this exact blob was already saved here
+            hasher = hashlib.sha256()
+            for i in range(body_start, len(url), _B64_CHUNK):
+                hasher.update(url[i:i + _B64_CHUNK].encode("ascii"))
+            dedup_key = (name, expected_size, hasher.hexdigest())
+
+            if (_seen_attachments.get(dedup_key) == str(path)
+                    and os.path.exists(path)
+                    and os.path.getsize(path) == expected_size):
+                print(f"♻️ Attachment {name} unchanged, reusing {path}")
+            else:
+                # Decode chunk slices straight from the data URL; only
+                # one chunk-sized slice is ever alive at a time. Write
+                # atomically so a failed decode never leaves a partial
+                # file that a later dedup check could trust.
+                tmp_path = str(path) + ".tmp"
+                with open(tmp_path, "wb") as f:
+                    for i in range(body_start, len(url), _B64_CHUNK):
+                        f.write(binascii.a2b_base64(url[i:i + _B64_CHUNK]))
+                os.replace(tmp_path, path)
+                _seen_attachments[dedup_key] = str(path)
+
             saved.append({
                 "name": name,
                 "path": str(path),
                 "mime": mime,
-                "size": len(data)
+                "size": os.path.getsize(path)
             })
         except Exception as e:
             print(f"Failed to decode attachment {name}: {e}")
@@ -59,108 +152,189 @@ def summarize_attachment_meta(saved):
     return "\n".join(summaries)
 
 
-def generate_app_code(brief, attachments=None, checks=None, round_num=1, prev_readme=None):
+class GeminiRateLimiter:
+    """
+    Proactive token bucket for Gemini RPM/TPM limits.
+    acquire() blocks until both budgets allow the call, so concurrent
+    tasks never trip 429s and silently degrade to the fallback HTML.
+    Blocking is safe because generate_app_code runs on a worker thread
+    (asyncio.to_thread in the pipeline), never on the event loop; the
+    threading.Lock keeps concurrent worker threads consistent.
+    Budgets refill continuously; an 80% safety margin leaves headroom
+    for token-estimation error. Limits come from GEMINI_RPM/GEMINI_TPM.
+    """
+    SAFETY_MARGIN = 0.8
+
+    def __init__(self, rpm=None, tpm=None):
+        self.rpm = (rpm or int(os.getenv("GEMINI_RPM", "10"))) * self.SAFETY_MARGIN
+        self.tpm = (tpm or int(os.getenv("GEMINI_TPM", "250000"))) * self.SAFETY_MARGIN
+        self._lock = threading.Lock()
+        self._req_budget = self.rpm
+        self._tok_budget = self.tpm
+        self._last_refill = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._req_budget = min(self.rpm, self._req_budget + elapsed * self.rpm / 60)
+        self._tok_budget = min(self.tpm, self._tok_budget + elapsed * self.tpm / 60)
+
+    def acquire(self, estimated_tokens):
+        """Block until one request plus estimated_tokens fit in the budget."""
+        # An estimate above bucket capacity could never be satisfied and
+        # would spin forever; clamp it so the call proceeds once a full
+        # budget has accumulated (the API enforces the real limit)
+        estimated_tokens = min(estimated_tokens, self.tpm)
+        while True:
+            with self._lock:
+                self._refill()
+                if self._req_budget >= 1 and self._tok_budget >= estimated_tokens:
+                    self._req_budget -= 1
+                    self._tok_budget -= estimated_tokens
+                    return
+                wait = max(
+                    (1 - self._req_budget) * 60 / self.rpm,
+                    (estimated_tokens - self._tok_budget) * 60 / self.tpm
+                )
+            print(f"⏳ Gemini rate budget exhausted, waiting {wait:.1f}s")
+            time.sleep(min(wait, 5))
+
+
+_rate_limiter = GeminiRateLimiter()
+
+
+def _generate_via_batch(client, content):
+    """
+    Submit a single-request batch job and poll until it finishes or
+    the GEMINI_BATCH_MAX_WAIT_SECONDS ceiling passes — batch jobs have
+    no latency guarantee, so polling must not wait indefinitely.
+    Batch Mode is billed at 50% of the synchronous rate.
+    Raises on timeout and on any non-success terminal state so callers
+    can fall back to the synchronous call.
+    """
+    job = client.batches.create(
+        model="gemini-2.5-flash",
+        src=[{"contents": [{"parts": [{"text": content}], "role": "user"}]}]
+    )
+    print(f"📦 Submitted Gemini batch job: {job.name}")
+    terminal = ("JOB_STATE_SUCCEEDED", "JOB_STATE_FAILED", "JOB_STATE_CANCELLED")
+    deadline = time.monotonic() + GEMINI_BATCH_MAX_WAIT_SECONDS
+    while job.state.name not in terminal:
+        if time.monotonic() >= deadline:
+            try:
+                client.batches.cancel(name=job.name)
+            except Exception:
+                pass
+            raise Exception(f"Batch job not done after {GEMINI_BATCH_MAX_WAIT_SECONDS}s")
+        time.sleep(GEMINI_BATCH_POLL_SECONDS)
+        job = client.batches.get(name=job.name)
+    if job.state.name != "JOB_STATE_SUCCEEDED":
+        raise Exception(f"Batch job ended in state {job.state.name}")
+    return job.dest.inlined_responses[0].response.text or ""
+
+
+def generate_app_code(brief, attachments=None, checks=None, round_num=1, prev_readme=None, saved_attachments=None):
     """
     Generate or revise web application code using Gemini API
-    
+
     Args:
         brief: Description of what to build
         attachments: List of file attachments (base64 encoded)
         checks: List of requirements/checks to satisfy
         round_num: Round number (1 or 2)
         prev_readme: Previous README content (for Round 2 revisions)
-    
+        saved_attachments: Already-decoded list from decode_attachments;
+            when given, attachments are not decoded again
+
     Returns:
         dict: {
             "files": {"index.html": code, "README.md": readme},
             "attachments": saved_attachments
         }
     """
-    # Handle attachments
-    saved = decode_attachments(attachments or [])
+    # Handle attachments (reuse the caller's decode when provided)
+    if saved_attachments is not None:
+        saved = saved_attachments
+    else:
+        saved = decode_attachments(attachments or [])
     attachments_meta = summarize_attachment_meta(saved)
-    
+
+    # Exact-match cache first: identical inputs return the stored files
+    # without any Gemini round-trip.
+    exact_key = LLMCache.make_key(
+        brief, checks, round_num, prev_readme,
+        [a["name"] for a in saved]
+    )
+    cached = _llm_cache.get(exact_key)
+    if cached:
+        return {"files": cached["files"], "attachments": saved}
+
+    # Check the generative cache: structurally similar briefs reuse
+    # prior output with the brief slot re-filled, skipping Gemini.
+    cache_key = gen_cache.template_key(brief, checks, round_num)
+    cached_files = gen_cache.lookup(cache_key, brief)
+    if cached_files:
+        return {"files": cached_files, "attachments": saved}
+
     # Build context for Round 2
     context_note = ""
     if round_num == 2 and prev_readme:
-        context_note = f"\n### Previous README.md:\n{prev_readme}\n\nRevise and enhance this project according to the new brief below.\n"
-    
-    # Build user prompt
-    user_prompt = f"""You are a professional web developer assistant.
+        context_note = f"\n### Previous README.md:\n{prev_readme}\n\nRevise and enhance this project according to the new brief above.\n"
 
-### Round
+    # Variable block appended after the static prefix
+    dynamic_block = f"""### Round
 {round_num}
 
 ### Task
 {brief}
 """
-    
+
     if context_note:
-        user_prompt += context_note
-    
+        dynamic_block += context_note
+
     if checks:
-        user_prompt += f"\n### Checks to Satisfy\n" + "\n".join(f"- {c}" for c in checks)
-    
+        dynamic_block += f"\n### Checks to Satisfy\n" + "\n".join(f"- {c}" for c in checks)
+
     if attachments_meta:
-        user_prompt += f"\n### Attachments Provided\n{attachments_meta}"
-    
+        dynamic_block += f"\n### Attachments Provided\n{attachments_meta}"
+
     # Generate code using Gemini
     try:
         if not GEMINI_API_KEY:
             raise Exception("GEMINI_API_KEY not found in environment")
-        
-        # Use new Gemini SDK format
-        client = genai.Client(api_key=GEMINI_API_KEY)
-        
-        # Create enhanced prompt
-        content = f"""{user_prompt}
 
-Generate complete, production-ready code.
+        client = _CLIENT
 
-Requirements:
-- Create a single, self-contained HTML file with embedded CSS and JavaScript
-- Modern, professional design with clean UI/UX
-- Fully responsive (mobile-first approach)
-- Use semantic HTML5 elements
-- Professional color scheme and typography
-- Include all necessary styling inline in <style> tags
-- Include all JavaScript inline in <script> tags
-- No external dependencies (no CDN links)
+        # Static prefix first, variable inputs last (prefix-cache friendly)
+        content = f"{STATIC_SYSTEM_PREFIX}\n\n### Variable Inputs\n{dynamic_block}"
 
-IMPORTANT OUTPUT FORMAT:
-1. First, output the complete HTML code
-2. Then add a separator line: ---README.md---
-3. Then output a detailed README.md with:
-   - Project description
-   - Features
-   - How to use
-   - Technologies used
+        # Wait for rate budget before hitting the API (~4 chars/token)
+        _rate_limiter.acquire(len(content) // 4)
+
+        # Generate content using new SDK (batch when enabled, else sync)
+        text = None
+        if GEMINI_BATCH_MODE:
+            try:
+                text = _generate_via_batch(client, content)
+            except Exception as e:
+                print(f"⚠️ Batch mode failed: {e}, falling back to sync call")
+
+        if text is None:
+            response = client.models.generate_content(
+                model="gemini-2.5-flash",
+                contents=content
+            )
+            text = response.text or ""
 
-Start HTML directly with <!DOCTYPE html>.
-"""
-        
-        # Generate content using new SDK
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=content
-        )
-        
-        text = response.text or ""
-        
-        # Clean up markdown code blocks
-        text = text.strip()
-        
-        # Remove markdown code block markers
-        if "html" in text[:20]:
-            text = text.replace(chr(96)*3 + "html", "", 1)
-        
-        text = text.replace(chr(96)*3, "")
         text = text.strip()
-        
+
         print("✅ Generated code using Gemini API.")
-        
+        from_gemini = True
+
     except Exception as e:
         print(f"⚠️ Gemini API failed: {e}, using fallback HTML instead")
+        from_gemini = False
         text = f"""{generate_fallback_html(brief)}---README.md---
 {generate_readme_fallback(brief, checks, attachments_meta, round_num)}"""
     
@@ -174,25 +348,31 @@ Start HTML directly with <!DOCTYPE html>.
         readme_part = generate_readme_fallback(brief, checks, attachments_meta, round_num)
     
     files = {"index.html": code_part, "README.md": readme_part}
+
+    # Only cache real Gemini output, never the fallback HTML
+    if from_gemini:
+        _llm_cache.set(exact_key, {"files": files})
+        gen_cache.store(cache_key, brief, files)
+
     return {"files": files, "attachments": saved}
 
 
-def generate_fallback_html(brief):
-    """Generate simple fallback HTML when API fails"""
-    return f"""<!DOCTYPE html>
+# Plain string template (real CSS braces, no f-string re-parse per
+# call); {BRIEF} is the only slot
+_FALLBACK_TEMPLATE = """<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>Generated App</title>
     <style>
-        * {{
+        * {
             margin: 0;
             padding: 0;
             box-sizing: border-box;
-        }}
-        
-        body {{
+        }
+
+        body {
             font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
             background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
             min-height: 100vh;
@@ -200,9 +380,9 @@ def generate_fallback_html(brief):
             align-items: center;
             justify-content: center;
             padding: 20px;
-        }}
-        
-        .container {{
+        }
+
+        .container {
             background: rgba(255, 255, 255, 0.95);
             border-radius: 20px;
             padding: 40px;
@@ -210,46 +390,46 @@ def generate_fallback_html(brief):
             width: 100%;
             box-shadow: 0 20px 60px rgba(0,0,0,0.3);
             animation: fadeIn 0.5s ease-in;
-        }}
-        
-        @keyframes fadeIn {{
-            from {{ opacity: 0; transform: translateY(20px); }}
-            to {{ opacity: 1; transform: translateY(0); }}
-        }}
-        
-        h1 {{
+        }
+
+        @keyframes fadeIn {
+            from { opacity: 0; transform: translateY(20px); }
+            to { opacity: 1; transform: translateY(0); }
+        }
+
+        h1 {
             color: #667eea;
             margin-bottom: 20px;
             font-size: 2.5em;
-        }}
-        
-        p {{
+        }
+
+        p {
             color: #333;
             line-height: 1.6;
             margin-bottom: 15px;
-        }}
-        
-        .info {{
+        }
+
+        .info {
             background: #f0f0f0;
             padding: 20px;
             border-radius: 10px;
             margin-top: 20px;
             border-left: 4px solid #667eea;
-        }}
-        
-        .info strong {{
+        }
+
+        .info strong {
             color: #764ba2;
-        }}
-        
-        @media (max-width: 600px) {{
-            .container {{
+        }
+
+        @media (max-width: 600px) {
+            .container {
                 padding: 20px;
-            }}
-            
-            h1 {{
+            }
+
+            h1 {
                 font-size: 1.8em;
-            }}
-        }}
+            }
+        }
     </style>
 </head>
 <body>
@@ -258,13 +438,32 @@ def generate_fallback_html(brief):
         <p>This application was generated using LLM technology.</p>
         <p>The system successfully processed your request and created this responsive web application.</p>
         <div class="info">
-            <strong>Brief:</strong> {brief}
+            <strong>Brief:</strong> {BRIEF}
         </div>
     </div>
 </body>
 </html>"""
 
 
+def generate_fallback_html(brief):
+    """Generate simple fallback HTML when API fails"""
+    # html.escape keeps a hostile brief from injecting markup
+    return _FALLBACK_TEMPLATE.replace("{BRIEF}", html.escape(brief or ""))
+
+
+_README_FALLBACK_TAIL = """## Usage
+Open `index.html` in a web browser to view the application.
+
+## Technologies
+- HTML5
+- CSS3
+- JavaScript
+
+---
+*Generated using LLM Code Generator*
+"""
+
+
 def generate_readme_fallback(brief, checks, attachments_meta, round_num):
     """Generate README.md content"""
     content = f"""# Generated Web Application
@@ -286,32 +485,16 @@ Round {round_num}
     if attachments_meta:
         content += "## Attachments\n{}\n\n".format(attachments_meta)
     
-    content += """## Usage
-Open `index.html` in a web browser to view the application.
-
-## Technologies
-- HTML5
-- CSS3
-- JavaScript
+    content += _README_FALLBACK_TAIL
 
----
-*Generated using LLM Code Generator*
-"""
-    
     return content
 
 
+# Matches ``` fences with an optional html/markdown language tag;
+# one substitution pass instead of three full-string replaces
+_FENCE_RE = re.compile(chr(96) * 3 + r"(?:html|markdown)?\n?", re.IGNORECASE)
+
+
 def _strip_code_block(text):
-    """Remove markdown code block markers"""
-    text = text.strip()
-    
-    # Use chr(96) to avoid syntax errors with backticks
-    backtick = chr(96)
-    triple_backtick = backtick * 3
-    
-    # Remove code block markers
-    text = text.replace(triple_backtick + "html", "")
-    text = text.replace(triple_backtick + "markdown", "")
-    text = text.replace(triple_backtick, "")
-    
-    return text.strip()
+    """Remove markdown code block markers in a single pass"""
+    return _FENCE_RE.sub("", text.strip()).strip()